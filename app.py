@@ -3,17 +3,21 @@
 from fastapi import FastAPI, Depends, HTTPException, Query # api key requirement for endpoints importantes como queuery
 import uvicorn
 import os
+import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from utils import ensure_indexes, parse_rss, normalize_many
 from rss_resources import RSS_FEEDS
 from pymongo.errors import DuplicateKeyError
+from pymongo import ReturnDocument
+from datetime import datetime, timezone
 from bson.objectid import ObjectId
 from copy import deepcopy
 import google.generativeai as genai
 from pydantic import BaseModel
 from gemini import gemini_process_articles
+from digest import ensure_digest_indexes, update_digests, rebuild_digests, serialize_digest, DIGEST_KINDS, DIGEST_PROJECTION
 from fastapi import BackgroundTasks
 
 
@@ -37,11 +41,53 @@ GEMINI_MODEL = os.getenv("GEMINI_MODEL")
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME", "cyberguardian")  # Default to "cyberguardian"
 COLLECTION = os.getenv("COLLECTION")
+DIGEST_COLLECTION = os.getenv("DIGEST_COLLECTION", "digests")  # Default to "digests"
+
+# MONGO POOL SETTINGS (from dotenv). timeouts en ms, vacío = default del driver
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_CONNECTING = int(os.getenv("MONGO_MAX_CONNECTING", "2"))  # conexiones nuevas en paralelo: el cuello con el pool frío
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd")  # pymongo[zstd] ya viene en requirements
+
+
+def mongo_client_options() -> dict:
+    """
+    Arma los kwargs del AsyncIOMotorClient: tamaño del pool, timeouts y compresión del wire protocol.
+    """
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxConnecting": MONGO_MAX_CONNECTING,
+    }
+    timeouts = {
+        "maxIdleTimeMS": "MONGO_MAX_IDLE_TIME_MS",
+        "waitQueueTimeoutMS": "MONGO_WAIT_QUEUE_TIMEOUT_MS",
+        "serverSelectionTimeoutMS": "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+        "connectTimeoutMS": "MONGO_CONNECT_TIMEOUT_MS",
+        "socketTimeoutMS": "MONGO_SOCKET_TIMEOUT_MS",
+    }
+    for option, env_name in timeouts.items():
+        value = os.getenv(env_name)
+        if value:
+            options[option] = int(value)
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return options
+
 
 # client Mongo 
-client = AsyncIOMotorClient(MONGO_URI)
+client = AsyncIOMotorClient(MONGO_URI, **mongo_client_options())
 db = client[DB_NAME]
 coll = db[COLLECTION]
+digest_coll = db[DIGEST_COLLECTION]
+
+# rebuild vs processing: el rebuild no es seguro con $inc concurrentes, así que
+# - process_article_auto espera a que termine un rebuild antes de escribir
+# - /digest/rebuild responde 409 si hay artículos escribiéndose
+# (solo dentro de este proceso: con varios workers, correr el rebuild sin /sync activo)
+digest_rebuild_done = asyncio.Event()
+digest_rebuild_done.set()
+digest_writes_in_flight = 0
 
 #initialize fastapI
 
@@ -66,6 +112,10 @@ async def get_mongo_data():
 @app.on_event("startup")
 async def startup_event():
     await ensure_indexes(coll)
+    await ensure_digest_indexes(digest_coll)
+    # backfill: si no hay digests (primer deploy o clear-db), los armamos desde lo ya procesado
+    if await digest_coll.estimated_document_count() == 0:
+        await rebuild_digests(coll, digest_coll)
 
 
 # api key requirement for endpoints importantes como queue
@@ -79,6 +129,7 @@ def require_api_key(api_key: str = Query(..., description="API Key for authentic
 async def clear_database():
     """ Borra todos los documentos de la colección - SOLO PARA TESTING """
     result = await coll.delete_many({})
+    await digest_coll.delete_many({})
     return {"deleted_count": result.deleted_count}
 
 # ingest process: implementar parsing, hashing, normalizing
@@ -89,7 +140,7 @@ async def ingest_run(limit:  int = 15):
     duplicates = 0
     errors = 0
     for name, url in RSS_FEEDS.items():
-        raw_items = parse_rss(name, url)
+        raw_items = await asyncio.to_thread(parse_rss, name, url)  # feedparser bloquea, lo mandamos a un thread
         normalized_items = normalize_many(raw_items)
         for item in normalized_items[:limit]:
             try:
@@ -228,22 +279,93 @@ async def process_article_auto(item_id: str, _auth=Depends(require_api_key)):
     # Call GEMINI API
     gemini_response = await gemini_process_articles(item, model_name=GEMINI_MODEL)
 
-    # update MONGO
-    res = await coll.update_one(
+    # no escribimos mientras corre un rebuild de digests
+    await digest_rebuild_done.wait()
+    global digest_writes_in_flight
+    digest_writes_in_flight += 1
+    try:
+        return await save_processed_article(item_id, o_id, gemini_response)
+    finally:
+        digest_writes_in_flight -= 1
+
+
+async def save_processed_article(item_id: str, o_id: ObjectId, gemini_response: dict):
+    """
+    Guarda la respuesta de gemini en el artículo y actualiza sus digests.
+    """
+    # update MONGO (regresa el artículo ya procesado para el digest)
+    processed = await coll.find_one_and_update(
         {"_id": o_id, "processed": False}, 
         {"$set": {
             "processed": True, 
+            "processed_at": datetime.now(timezone.utc).isoformat(),
             "digest_es": gemini_response["digest_es"] or "", 
             "kickstarter_es": gemini_response["kickstarter_es"] or "", 
             "activity_es": gemini_response["activity_es"] or "", 
             "risk_level": gemini_response["risk_level"] or ""
-        }})
+        }},
+        projection=DIGEST_PROJECTION,
+        return_document=ReturnDocument.AFTER)
 
-    if res.matched_count == 0:
+    if not processed:
         raise HTTPException(status_code=404, detail="COULD NOT MODIFY ITEM. IT HAS BEEN ALREADY PROCESSED!!!")
 
+    # update DIGESTS (solo si este request fue el que marcó el item como procesado)
+    # el artículo ya quedó guardado: si falla el digest no regresamos 500, se repara con /digest/rebuild
+    try:
+        await update_digests(digest_coll, processed)
+    except Exception as e:
+        print(f"Error updating digests for {item_id}: {e}")
+
     return {"ok": True, "id": item_id}
 
+
+# digest precalculado para el newsletter
+@app.get("/digest")
+async def get_digests(_auth=Depends(require_api_key)):
+    """
+    Devuelve todos los digests (por categoría y por risk_level) ya calculados.
+    Son pocos documentos (uno por categoría / nivel de riesgo), así que no depende del tamaño del corpus.
+    """
+    items = []
+    async for doc in digest_coll.find({}):
+        items.append(serialize_digest(doc))
+    return {"digests": items}
+
+
+@app.post("/digest/rebuild")
+async def rebuild_digest(_auth=Depends(require_api_key)):
+    """
+    Recalcula todos los digests desde los artículos procesados (backfill / reparación).
+    Mientras corre, process_article_auto espera antes de escribir; si ya hay escrituras en curso responde 409.
+    """
+    if not digest_rebuild_done.is_set() or digest_writes_in_flight > 0:
+        raise HTTPException(status_code=409, detail="Hay artículos procesándose o un rebuild en curso, intenta después")
+
+    digest_rebuild_done.clear()
+    try:
+        rebuilt = await rebuild_digests(coll, digest_coll)
+    finally:
+        digest_rebuild_done.set()
+    return {"rebuilt": rebuilt}
+
+
+@app.get("/digest/{kind}/{key}")
+async def get_digest(kind: str, key: str, _auth=Depends(require_api_key)):
+    """
+     kind: "category" o "risk_level"
+     key: valor de la categoría o del nivel de riesgo
+     Una sola lectura indexada sobre (kind, key)
+    """
+    if kind not in DIGEST_KINDS:
+        raise HTTPException(status_code=400, detail="Invalid digest kind")
+
+    doc = await digest_coll.find_one({"kind": kind, "key": key})
+    if not doc:
+        raise HTTPException(status_code=404, detail="DIGEST NOT FOUND !!!")
+
+    return serialize_digest(doc)
+
 @app.post("/sync")
 async def sync_articles(background_tasks: BackgroundTasks, limit: int = 10, api_key: str = Query(...)):
     """
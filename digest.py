@@ -0,0 +1,177 @@
+from pymongo import ASCENDING, DESCENDING
+import os
+
+
+# cuántos artículos procesados guardamos por documento de digest
+DIGEST_LATEST_N = int(os.getenv("DIGEST_LATEST_N", "20"))
+
+# tipos de agrupación que mantiene el digest
+DIGEST_KINDS = ("category", "risk_level")
+
+# campos del artículo procesado que necesita una entrada del digest
+DIGEST_PROJECTION = {
+    "title": 1,
+    "url": 1,
+    "source": 1,
+    "published": 1,
+    "category": 1,
+    "digest_es": 1,
+    "kickstarter_es": 1,
+    "activity_es": 1,
+    "risk_level": 1,
+    "processed_at": 1,
+}
+
+
+async def ensure_digest_indexes(digest_coll):
+    """
+    Crea índices de la colección de digests:
+    - (kind, key): único, así cada vista se sirve con una sola lectura indexada
+    """
+    await digest_coll.create_index([("kind", ASCENDING), ("key", ASCENDING)], unique=True)
+
+
+def digest_key(kind: str, value) -> str:
+    """
+    Normaliza el valor de agrupación: artículos viejos pueden no traer categoría o risk_level.
+    """
+    if kind == "category":
+        return value or "otros"
+    return value or "medio"
+
+
+def digest_entry(article: dict) -> dict:
+    """
+    Arma la entrada compacta que se guarda en el digest a partir de un artículo ya procesado.
+    """
+    return {
+        "id": str(article["_id"]),
+        "title": article.get("title", ""),
+        "url": article.get("url", ""),
+        "source": article.get("source", ""),
+        "published": article.get("published"),
+        "category": digest_key("category", article.get("category")),
+        "digest_es": article.get("digest_es") or "",
+        "kickstarter_es": article.get("kickstarter_es") or "",
+        "activity_es": article.get("activity_es") or "",
+        "risk_level": digest_key("risk_level", article.get("risk_level")),
+        "processed_at": article.get("processed_at"),
+    }
+
+
+async def update_digests(digest_coll, article: dict):
+    """
+    Actualiza de forma incremental los digests de la categoría y del risk_level del artículo.
+    Cada documento lleva el conteo total, la distribución de riesgo y los últimos N artículos procesados,
+    para que el front no tenga que recalcular nada al armar el newsletter.
+    """
+    entry = digest_entry(article)
+    risk_level = entry["risk_level"]
+
+    for kind in DIGEST_KINDS:
+        # si un rebuild ya lo metió en latest, lo quitamos antes del push para no duplicarlo
+        await digest_coll.update_one(
+            {"kind": kind, "key": entry[kind]},
+            {"$pull": {"latest": {"id": entry["id"]}}},
+        )
+        await digest_coll.update_one(
+            {"kind": kind, "key": entry[kind]},
+            {
+                "$inc": {"count": 1, f"risk_distribution.{risk_level}": 1},
+                "$push": {"latest": {
+                    "$each": [entry],
+                    "$sort": {"processed_at": -1},
+                    "$slice": DIGEST_LATEST_N,
+                }},
+                "$set": {"updated_at": entry["processed_at"]},
+            },
+            upsert=True,
+        )
+
+
+def merge_digest_rows(rows: list[dict]) -> dict:
+    """
+     rows: salida de la agregación por (category, risk_level) -> {"_id": {...}, "count": n}
+     output: kind -> key -> {"count", "risk_distribution", "raw"}
+     "raw" son los valores tal cual están en mongo (None, "", ...) que caen en esa key, para el $in del find
+    """
+    summaries = {kind: {} for kind in DIGEST_KINDS}
+    for row in rows:
+        raw = {kind: row["_id"].get(kind) for kind in DIGEST_KINDS}
+        risk_level = digest_key("risk_level", raw["risk_level"])
+        for kind in DIGEST_KINDS:
+            summary = summaries[kind].setdefault(
+                digest_key(kind, raw[kind]),
+                {"count": 0, "risk_distribution": {}, "raw": set()},
+            )
+            summary["count"] += row["count"]
+            summary["risk_distribution"][risk_level] = summary["risk_distribution"].get(risk_level, 0) + row["count"]
+            summary["raw"].add(raw[kind])
+    return summaries
+
+
+async def rebuild_digests(coll, digest_coll) -> int:
+    """
+    Recalcula todos los digests desde los artículos procesados (backfill y reparación).
+    - conteos y distribución de riesgo: una agregación por (category, risk_level)
+    - últimos N: una lectura ordenada por processed_at por cada categoría / nivel de riesgo
+    Devuelve cuántos documentos de digest quedaron.
+    NO es seguro correrlo mientras se procesan artículos (los $inc concurrentes se pierden):
+    app.py lo serializa contra process_article_auto.
+    """
+    pipeline = [
+        {"$match": {"processed": True}},
+        {"$group": {
+            "_id": {"category": "$category", "risk_level": "$risk_level"},
+            "count": {"$sum": 1},
+        }},
+    ]
+
+    rows = await coll.aggregate(pipeline).to_list(None)
+    summaries = merge_digest_rows(rows)
+
+    kept = []
+    for kind, by_key in summaries.items():
+        for key, summary in by_key.items():
+            # usa el índice (kind, processed_at); los procesados antes de guardar processed_at quedan al final
+            latest = await coll.find(
+                {"processed": True, kind: {"$in": list(summary["raw"])}},
+                DIGEST_PROJECTION,
+            ).sort("processed_at", DESCENDING).limit(DIGEST_LATEST_N).to_list(DIGEST_LATEST_N)
+            entries = [digest_entry(article) for article in latest]
+
+            await digest_coll.replace_one(
+                {"kind": kind, "key": key},
+                {
+                    "kind": kind,
+                    "key": key,
+                    "count": summary["count"],
+                    "risk_distribution": summary["risk_distribution"],
+                    "latest": entries,
+                    "updated_at": entries[0]["processed_at"] if entries else None,
+                },
+                upsert=True,
+            )
+            kept.append({"kind": kind, "key": key})
+
+    # borra digests de categorías / niveles que ya no tienen artículos
+    if kept:
+        await digest_coll.delete_many({"$nor": kept})
+    else:
+        await digest_coll.delete_many({})
+
+    return len(kept)
+
+
+def serialize_digest(doc: dict) -> dict:
+    """
+    Quita el _id de Mongo para que el documento sea serializable en JSON.
+    """
+    return {
+        "kind": doc["kind"],
+        "key": doc["key"],
+        "count": doc.get("count", 0),
+        "risk_distribution": doc.get("risk_distribution", {}),
+        "latest": doc.get("latest", []),
+        "updated_at": doc.get("updated_at"),
+    }
@@ -69,8 +69,8 @@ Published: {published}
         top_p=0.95,
         top_k=40
     ))
-    # keep it simple
-    response = model.generate_content(content)
+    # async para no bloquear el event loop mientras gemini responde
+    response = await model.generate_content_async(content)
 
     try:
         # Clean response text (remove markdown if present)
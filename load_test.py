@@ -0,0 +1,246 @@
+# LOAD TEST: levanta la API contra un mongod local con un gemini y RSS falsos, y mide cada ruta
+#
+#   python load_test.py --concurrency 200 --requests 2000
+#
+# requiere un mongod local en MONGO_URI (default mongodb://localhost:27017) y pip install -r requirements-dev.txt
+# OJO: borra la db de load test (cyberguardian_loadtest); con un MONGO_URI remoto se niega a correr sin --allow-remote
+# la config del pool se toma de las mismas env vars que app.py (MONGO_MAX_POOL_SIZE, MONGO_COMPRESSORS, ...)
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+
+# env del harness ANTES de importar app (app.py lee el env al importarse)
+# MONGO_URI se puede exportar; todo lo demás se sobreescribe siempre para no tocar datos reales
+DEFAULT_MONGO_URI = "mongodb://localhost:27017"
+LOADTEST_ENV = {
+    "DB_NAME": "cyberguardian_loadtest",
+    "COLLECTION": "articles",
+    "DIGEST_COLLECTION": "digests",
+    "API_KEY": "loadtest",
+    "GEMINI_API_KEY": "fake",
+    "GEMINI_MODEL": "fake",
+}
+
+# latencia simulada de gemini y tamaño de cada feed falso
+FAKE_GEMINI_LATENCY_MS = int(os.getenv("FAKE_GEMINI_LATENCY_MS", "200"))
+FAKE_FEED_SIZE = int(os.getenv("FAKE_FEED_SIZE", "50"))
+
+
+############### FAKES ################
+
+def fake_parse_rss(name: str, url: str) -> list[dict]:
+    """
+    Reemplaza parse_rss: genera artículos únicos con el mismo shape crudo, sin tocar la red.
+    """
+    items = []
+    for _ in range(FAKE_FEED_SIZE):
+        token = uuid.uuid4().hex
+        items.append({
+            "source": name,
+            "url": f"https://example.com/{name}/{token}",
+            "title": f"Phishing scam alert {token}",
+            "published_raw": time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime()),
+            "published_parsed": None,
+            "summary_raw": "Scammers target children on social media with fake giveaways.",
+            "processed": False
+        })
+    return items
+
+
+FAKE_GEMINI_JSON = json.dumps({
+    "digest_es": "Resumen: estafadores usan regalos falsos en redes sociales.",
+    "kickstarter_es": ["¿Qué señales te harían dudar?", "¿Con quién pedirías ayuda?"],
+    "activity_es": {"titulo": "Detectives anti-phishing", "pasos": ["Ver remitente", "Revisar enlace"]},
+    "risk_level": "medio"
+}, ensure_ascii=False)
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    Reemplaza genai.GenerativeModel: gemini.py corre completo (prompt, parsing del JSON),
+    solo la llamada de red se cambia por FAKE_GEMINI_LATENCY_MS de espera.
+    La versión sync bloquea de verdad, así una regresión a generate_content se nota en los números.
+    """
+    def __init__(self, model_name: str = None, generation_config=None, **kwargs):
+        self.model_name = model_name
+
+    async def generate_content_async(self, content, **kwargs):
+        await asyncio.sleep(FAKE_GEMINI_LATENCY_MS / 1000)
+        return FakeResponse("```json\n" + FAKE_GEMINI_JSON + "\n```")
+
+    def generate_content(self, content, **kwargs):
+        time.sleep(FAKE_GEMINI_LATENCY_MS / 1000)
+        return FakeResponse("```json\n" + FAKE_GEMINI_JSON + "\n```")
+
+
+def serve(port: int):
+    """
+    Corre la app real con los fakes parchados, en su propio proceso (como un worker de producción).
+    """
+    import uvicorn
+    import google.generativeai as genai
+    import app
+
+    app.parse_rss = fake_parse_rss
+    genai.GenerativeModel = FakeGenerativeModel
+    uvicorn.run(app.app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+############### DRIVER ################
+
+def is_local_mongo(uri: str) -> bool:
+    """
+    True si todos los hosts del MONGO_URI son localhost / 127.0.0.1 (mongodb+srv siempre es remoto).
+    """
+    from pymongo.uri_parser import parse_uri
+
+    if not uri.startswith("mongodb://"):
+        return False
+    nodes = parse_uri(uri)["nodelist"]
+    return bool(nodes) and all(host in ("localhost", "127.0.0.1", "::1") for host, _ in nodes)
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_route(client: httpx.AsyncClient, name: str, make_request, total: int, concurrency: int) -> dict:
+    """
+    Lanza [total] requests con [concurrency] en vuelo y regresa throughput y latencias (ms).
+    """
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await make_request(client, i)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "route": name,
+        "requests": total,
+        "errors": errors,
+        "rps": total / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+
+async def wait_until_up(client: httpx.AsyncClient, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get("/")
+            return
+        except httpx.HTTPError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("La API no levantó a tiempo")
+
+
+async def drive(base_url: str, total: int, concurrency: int):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    api_key = os.environ["API_KEY"]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await wait_until_up(client)
+
+        # arranca de cero y siembra suficientes artículos sin procesar para /process
+        response = await client.delete("/clear-db")
+        response.raise_for_status()
+        mongo = AsyncIOMotorClient(os.environ["MONGO_URI"])
+        try:
+            articles = mongo[os.environ["DB_NAME"]][os.environ["COLLECTION"]]
+            while True:
+                response = await client.post("/ingest/run", params={"limit": FAKE_FEED_SIZE})
+                response.raise_for_status()
+                if response.json().get("inserted", 0) == 0:
+                    raise RuntimeError(f"/ingest/run no insertó nada al sembrar: {response.text}")
+                ids = [str(doc["_id"]) async for doc in articles.find({"processed": False}, {"_id": 1})]
+                if len(ids) >= total:
+                    break
+        finally:
+            mongo.close()
+
+        # /sync va al final: deja background tasks procesando que contaminarían las rutas siguientes
+        routes = [
+            ("GET /queue", lambda c, i: c.get("/queue", params={"limit": 10, "api_key": api_key})),
+            ("POST /process/{id}/auto", lambda c, i: c.post(f"/process/{ids[i]}/auto", params={"api_key": api_key})),
+            ("GET /digest", lambda c, i: c.get("/digest", params={"api_key": api_key})),
+            ("POST /sync", lambda c, i: c.post("/sync", params={"limit": 10, "api_key": api_key})),
+        ]
+
+        results = []
+        for name, make_request in routes:
+            results.append(await run_route(client, name, make_request, total, concurrency))
+
+    print(f"\nconcurrency={concurrency} requests/route={total} fake_gemini_latency={FAKE_GEMINI_LATENCY_MS}ms")
+    print(f"{'route':<26}{'req':>7}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for r in results:
+        print(f"{r['route']:<26}{r['requests']:>7}{r['errors']:>6}{r['rps']:>10.1f}{r['p50']:>10.1f}{r['p95']:>10.1f}{r['p99']:>10.1f}")
+    print("* POST /sync: la latencia NO incluye el procesamiento en background (solo ingest + queue)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test de la API contra mongod local y gemini falso")
+    parser.add_argument("mode", nargs="?", default="run", choices=["run", "serve"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--requests", type=int, default=1000, help="requests por ruta")
+    parser.add_argument("--concurrency", type=int, default=100, help="requests en vuelo al mismo tiempo")
+    parser.add_argument("--allow-remote", action="store_true", help="permite un MONGO_URI que no sea localhost")
+    args = parser.parse_args()
+
+    os.environ.setdefault("MONGO_URI", DEFAULT_MONGO_URI)
+    os.environ.update(LOADTEST_ENV)
+
+    if not args.allow_remote and not is_local_mongo(os.environ["MONGO_URI"]):
+        sys.exit("MONGO_URI no es localhost: el load test borra la db. Usa --allow-remote si de verdad quieres.")
+
+    if args.mode == "serve":
+        serve(args.port)
+        return
+
+    serve_args = [sys.executable, __file__, "serve", "--port", str(args.port)]
+    if args.allow_remote:
+        serve_args.append("--allow-remote")
+    server = subprocess.Popen(serve_args, env=os.environ.copy())
+    try:
+        asyncio.run(drive(f"http://127.0.0.1:{args.port}", args.requests, args.concurrency))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
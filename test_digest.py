@@ -0,0 +1,81 @@
+from bson.objectid import ObjectId
+from digest import digest_key, digest_entry, merge_digest_rows
+
+
+def test_digest_key_defaults():
+    assert digest_key("category", None) == "otros"
+    assert digest_key("category", "") == "otros"
+    assert digest_key("category", "phishing") == "phishing"
+    assert digest_key("risk_level", None) == "medio"
+    assert digest_key("risk_level", "") == "medio"
+    assert digest_key("risk_level", "alto") == "alto"
+
+
+def test_digest_entry_from_processed_article():
+    o_id = ObjectId()
+    article = {
+        "_id": o_id,
+        "title": "Scam alert",
+        "url": "https://example.com/a",
+        "source": "FTC_consumer_blog",
+        "published": "2025-07-22T07:47:00+00:00",
+        "category": "phishing",
+        "digest_es": "Resumen",
+        "kickstarter_es": ["¿Qué harías?"],
+        "activity_es": {"titulo": "Detectives", "pasos": ["Ver remitente"]},
+        "risk_level": "alto",
+        "processed_at": "2025-07-23T10:00:00+00:00",
+    }
+
+    entry = digest_entry(article)
+
+    assert entry["id"] == str(o_id)
+    assert entry["category"] == "phishing"
+    assert entry["risk_level"] == "alto"
+    assert entry["kickstarter_es"] == ["¿Qué harías?"]
+    assert entry["processed_at"] == "2025-07-23T10:00:00+00:00"
+
+
+def test_digest_entry_old_article_without_fields():
+    entry = digest_entry({"_id": ObjectId(), "title": "Viejo", "risk_level": ""})
+
+    assert entry["category"] == "otros"
+    assert entry["risk_level"] == "medio"
+    assert entry["digest_es"] == ""
+    assert entry["processed_at"] is None
+
+
+def test_merge_digest_rows_folds_empty_values():
+    rows = [
+        {"_id": {"category": "phishing", "risk_level": "alto"}, "count": 3},
+        {"_id": {"category": "phishing", "risk_level": "medio"}, "count": 2},
+        {"_id": {"category": "phishing", "risk_level": ""}, "count": 1},
+        {"_id": {"risk_level": None}, "count": 4},
+        {"_id": {"category": "", "risk_level": "bajo"}, "count": 5},
+    ]
+
+    summaries = merge_digest_rows(rows)
+
+    phishing = summaries["category"]["phishing"]
+    assert phishing["count"] == 6
+    assert phishing["risk_distribution"] == {"alto": 3, "medio": 3}
+    assert phishing["raw"] == {"phishing"}
+
+    # sin categoría (campo faltante o "") cae en "otros"
+    otros = summaries["category"]["otros"]
+    assert otros["count"] == 9
+    assert otros["risk_distribution"] == {"medio": 4, "bajo": 5}
+    assert otros["raw"] == {None, ""}
+
+    # "medio", "" y None son la misma key, y los tres van al $in del find
+    medio = summaries["risk_level"]["medio"]
+    assert medio["count"] == 7
+    assert medio["risk_distribution"] == {"medio": 7}
+    assert medio["raw"] == {"medio", "", None}
+
+    assert summaries["risk_level"]["alto"]["count"] == 3
+    assert summaries["risk_level"]["bajo"]["count"] == 5
+
+
+def test_merge_digest_rows_empty():
+    assert merge_digest_rows([]) == {"category": {}, "risk_level": {}}
@@ -24,10 +24,13 @@ async def ensure_indexes(coll):
     - hash: único (para evitar duplicados)
     - processed: para búsquedas rápidas de cola/digest
     - published_at: para ordenar por fecha
+    - (category, processed_at) y (risk_level, processed_at): para los últimos procesados de cada digest al reconstruir
     """
     await coll.create_index([("hash", ASCENDING)], unique=True)
     await coll.create_index([("processed", ASCENDING)])
     await coll.create_index([("published_at", ASCENDING)])
+    await coll.create_index([("category", ASCENDING), ("processed_at", ASCENDING)])
+    await coll.create_index([("risk_level", ASCENDING), ("processed_at", ASCENDING)])
 
 
 